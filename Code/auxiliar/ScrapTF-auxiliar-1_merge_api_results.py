@@ -1,46 +1,327 @@
-import json
-import os
-
-
-base_path = "Downloads/" #Salvo em um diretório de interesse. Você pode, ao tentar replicar, salvar no mesmo diretório que o código, se quiser.
-
-file_names = [
-    os.path.join(base_path, 'pagina1.txt'),
-    os.path.join(base_path, 'pagina2.txt'),
-    os.path.join(base_path, 'pagina3.txt'),
-    os.path.join(base_path, 'pagina4.txt'),
-    os.path.join(base_path, 'pagina5.txt')
-]
-
-all_hits = []
-base_json = None
-
-
-for file_path in file_names:
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if base_json is None:
-                base_json = data
-            if 'result' in data and 'hits' in data['result'] and 'hits' in data['result']['hits']:
-                all_hits.extend(data['result']['hits']['hits'])
-            else:
-                print(f"Aviso: O arquivo {os.path.basename(file_path)} não contém a estrutura esperada 'result.hits.hits'.")
-
-    except FileNotFoundError:
-        print(f"Erro: O arquivo {file_path} não foi encontrado.")
-    except json.JSONDecodeError:
-        print(f"Erro: O arquivo {os.path.basename(file_path)} não contém um JSON válido.")
-    except Exception as e:
-        print(f"Ocorreu um erro ao processar o arquivo {os.path.basename(file_path)}: {e}")
-
-if base_json and all_hits:
-    base_json['result']['hits']['hits'] = all_hits
-    base_json['result']['hits']['total']['value'] = len(all_hits)
-    output_file = os.path.join(base_path, 'merged_result.json')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(base_json, f, ensure_ascii=False, indent=4)
-
-    print(f"Merge concluído com sucesso! O resultado foi salvo em '{output_file}'.")
-else:
-    print("Não foi possível realizar o merge. Verifique os arquivos de entrada.")
\ No newline at end of file
+import argparse
+import itertools
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+
+# Codecs opcionais, importados tardiamente por _importar_codecs(): assim
+# 'merge --help' não paga o custo de import de bibliotecas nativas.
+orjson = None
+ijson = None
+zstandard = None
+
+
+def _importar_codecs():
+    """Resolve os codecs opcionais, uma única vez, após o argparse."""
+    global orjson, ijson, zstandard
+    try:
+        import orjson  # parser/serializador nativo, bem mais rápido que o json da stdlib
+    except ImportError:
+        pass
+    try:
+        import ijson.backends.yajl2_c as ijson  # backend C, se disponível
+    except ImportError:
+        try:
+            import ijson
+        except ImportError:
+            pass
+    try:
+        import zstandard
+    except ImportError:
+        pass
+
+
+# O handler de stream do logging é thread-safe, então as mensagens dos
+# workers não se intercalam nem disputam o stdout uma a uma.
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+log = logging.getLogger('merge_api_results')
+
+# Buffer de leitura de 4 MB: o padrão de 8 KB gera milhares de read() por
+# página grande, sobretudo no caminho incremental do ijson.
+_BUFFER_LEITURA = 4 * 1024 * 1024
+
+_SENTINELA_HITS = "__HITS_SENTINELA__"
+
+# Sentinela publicada na fila por cada produtor ao terminar, para o escritor
+# saber quando todos os arquivos foram consumidos.
+_FIM_DO_ARQUIVO = object()
+
+
+def _numero_da_pagina(path):
+    """Extrai o número de 'paginaN.txt' para ordenar numericamente (10 > 9)."""
+    digitos = ''.join(c for c in path.stem if c.isdigit())
+    return int(digitos) if digitos else 0
+
+
+def descobrir_paginas(base_path):
+    """Descobre as páginas pelo padrão 'pagina*.txt', em ordem numérica."""
+    return [str(p) for p in sorted(Path(base_path).glob('pagina*.txt'), key=_numero_da_pagina)]
+
+
+def carregar_arquivo(file_path):
+    """Lê e faz o parse de um arquivo de página. Retorna (dados, erro).
+
+    O arquivo é mapeado em memória (mmap): o parser lê direto das páginas do
+    kernel, sem a cópia read() -> buffer do processo, e MADV_SEQUENTIAL deixa
+    o prefetch agressivo já que o parse é feito do início ao fim.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                if orjson is not None:
+                    # orjson aceita objetos buffer (memoryview), mas não o mmap em si
+                    return orjson.loads(memoryview(mm)), None
+                return json.loads(mm[:]), None
+    except FileNotFoundError:
+        return None, f"Erro: O arquivo {file_path} não foi encontrado."
+    except (json.JSONDecodeError, ValueError):
+        return None, f"Erro: O arquivo {os.path.basename(file_path)} não contém um JSON válido."
+    except Exception as e:
+        return None, f"Ocorreu um erro ao processar o arquivo {os.path.basename(file_path)}: {e}"
+
+
+def extrair_hits(file_path):
+    """Extrai a lista 'result.hits.hits' de um parse completo. Retorna (hits, erro).
+
+    Caminho de contingência para quando o ijson não está instalado; com ele,
+    produzir_hits faz o streaming do caminho de interesse diretamente.
+    """
+    data, erro = carregar_arquivo(file_path)
+    if erro:
+        return None, erro
+    try:
+        return data['result']['hits']['hits'], None
+    except (KeyError, TypeError):
+        return None, f"Aviso: O arquivo {os.path.basename(file_path)} não contém a estrutura esperada 'result.hits.hits'."
+
+
+def produzir_hits(file_path, fila):
+    """Worker do pipeline: publica os hits de um arquivo na fila, um a um.
+
+    Retorna uma mensagem de erro/aviso ou None. A sentinela de fim é sempre
+    publicada, mesmo em caso de falha, para o escritor não ficar esperando.
+    """
+    try:
+        if ijson is not None:
+            enviados = 0
+            with open(file_path, 'rb', buffering=_BUFFER_LEITURA) as f:
+                # use_float=True: sem ele o ijson entrega números como Decimal,
+                # que o orjson (e o json da stdlib) não serializa na escrita.
+                for hit in ijson.items(f, 'result.hits.hits.item', use_float=True):
+                    fila.put(hit)
+                    enviados += 1
+            if enviados == 0:
+                # Streaming sem nenhum item: o caminho 'result.hits.hits'
+                # não existe (ou está vazio) — avisa como no parse completo,
+                # em vez de descartar a página em silêncio.
+                return f"Aviso: O arquivo {os.path.basename(file_path)} não contém a estrutura esperada 'result.hits.hits'."
+            return None
+        hits, erro = extrair_hits(file_path)
+        if erro:
+            return erro
+        for hit in hits:
+            fila.put(hit)
+        return None
+    except FileNotFoundError:
+        return f"Erro: O arquivo {file_path} não foi encontrado."
+    except Exception as e:
+        return f"Ocorreu um erro ao processar o arquivo {os.path.basename(file_path)}: {e}"
+    finally:
+        fila.put(_FIM_DO_ARQUIVO)
+
+
+def drenar_em_ordem(filas):
+    """Gera os hits das filas na ordem dos arquivos.
+
+    Cada produtor tem a própria fila; a fila k só é lida depois que a k-1
+    publicar a sentinela. Os parses continuam em paralelo, mas os hits saem
+    na mesma ordem de páginas do merge sequencial — a saída é determinística.
+    """
+    for fila in filas:
+        while True:
+            item = fila.get()
+            if item is _FIM_DO_ARQUIVO:
+                break
+            yield item
+
+
+def escrever_merge(output_file, base_json, hits, identado=False, comprimir=False,
+                   total=None):
+    """Escreve o JSON final emitindo o array 'hits' elemento a elemento.
+
+    Como 'total.value' aparece no esqueleto antes do array, os hits são
+    primeiro escoados para um arquivo temporário enquanto são contados; em
+    seguida o arquivo final é montado em uma única escrita sequencial:
+    prefixo do esqueleto (já com o total certo), cópia do temporário em
+    blocos grandes e o sufixo. Nada do merge fica inteiro em memória.
+
+    Quando o chamador já sabe quantos hits virão (listas pré-contadas),
+    passe 'total': o desvio pelo temporário é dispensado e os hits fluem
+    direto para o arquivo final em uma única passada.
+    """
+    if orjson is not None:
+        serializar = orjson.dumps
+    else:
+        serializar = lambda obj: json.dumps(obj, ensure_ascii=False,
+                                            separators=(',', ':')).encode('utf-8')
+
+    spool_path = None
+    if total is None:
+        total = 0
+        destino = os.path.dirname(output_file) or '.'
+        with tempfile.NamedTemporaryFile(delete=False, dir=destino) as spool:
+            primeiro = True
+            for hit in hits:
+                if not primeiro:
+                    spool.write(b',\n')
+                spool.write(serializar(hit))
+                primeiro = False
+                total += 1
+            spool_path = spool.name
+
+    base_json['result']['hits']['hits'] = _SENTINELA_HITS
+    base_json['result']['hits']['total']['value'] = total
+
+    if orjson is not None:
+        opcoes = orjson.OPT_INDENT_2 if identado else 0
+        esqueleto = orjson.dumps(base_json, option=opcoes)
+        marcador = orjson.dumps(_SENTINELA_HITS)
+    else:
+        identacao = 4 if identado else None
+        separadores = None if identado else (',', ':')
+        esqueleto = json.dumps(base_json, ensure_ascii=False, indent=identacao,
+                               separators=separadores).encode('utf-8')
+        marcador = json.dumps(_SENTINELA_HITS).encode('utf-8')
+
+    prefixo, sufixo = esqueleto.split(marcador, 1)
+
+    def _gravar(f):
+        f.write(prefixo + b'[')
+        if spool_path is not None:
+            with open(spool_path, 'rb') as src:
+                shutil.copyfileobj(src, f, length=_BUFFER_LEITURA)
+        else:
+            primeiro = True
+            for hit in hits:
+                if not primeiro:
+                    f.write(b',\n')
+                f.write(serializar(hit))
+                primeiro = False
+        f.write(b']' + sufixo)
+
+    try:
+        with open(output_file, 'wb') as bruto:
+            if comprimir:
+                # threads=-1 liga a compressão multithread interna do zstd
+                compressor = zstandard.ZstdCompressor(level=3, threads=-1)
+                with compressor.stream_writer(bruto) as f:
+                    _gravar(f)
+            else:
+                _gravar(bruto)
+    finally:
+        if spool_path is not None:
+            os.remove(spool_path)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Junta as páginas 'pagina*.txt' exportadas da API do STF em um único merged_result.json.")
+    parser.add_argument('--base-path', default='Downloads/',
+                        help="Diretório com os arquivos 'pagina*.txt' (padrão: Downloads/). "
+                             "Você pode, ao tentar replicar, usar o mesmo diretório que o código, se quiser.")
+    parser.add_argument('--output', default=None,
+                        help='Arquivo de saída (padrão: <base-path>/merged_result.json).')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Threads de leitura/parse (padrão: uma por arquivo).')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Capacidade da fila entre leitores e escritor (padrão: 2x workers).')
+    parser.add_argument('--pretty', action='store_true',
+                        help='Escreve a saída identada (arquivo maior e escrita mais lenta).')
+    parser.add_argument('--zstd', action='store_true',
+                        help='Comprime a saída com zstd durante a escrita (gera .json.zst, ~5-10x menor).')
+    args = parser.parse_args()
+    _importar_codecs()
+
+    file_names = descobrir_paginas(args.base_path)
+    if not file_names:
+        log.error(f"Erro: Nenhum arquivo 'pagina*.txt' encontrado em '{args.base_path}'.")
+        return 1
+
+    comprimir = args.zstd or (args.output or '').endswith('.zst')
+    if comprimir and zstandard is None:
+        log.error("Erro: A compressão zstd requer o pacote 'zstandard' (pip install zstandard).")
+        return 1
+
+    nome_padrao = 'merged_result.json.zst' if comprimir else 'merged_result.json'
+    output_file = args.output or os.path.join(args.base_path, nome_padrao)
+    workers = args.workers or len(file_names)
+
+    # Pipeline leitura -> merge -> escrita: os produtores fazem o parse em
+    # paralelo e publicam hits em filas limitadas (back-pressure), enquanto
+    # o escritor consome e grava em streaming. O tempo total se aproxima de
+    # max(parse, escrita) em vez da soma das duas fases.
+    capacidade = args.chunk_size or 2 * workers
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Só o primeiro arquivo passa por um parse completo, para servir de
+        # esqueleto ('base_json') do resultado final.
+        base_json, erro_base = executor.submit(carregar_arquivo, file_names[0]).result()
+        if erro_base:
+            log.error(erro_base)
+        if base_json is None:
+            log.error("Não foi possível realizar o merge. Verifique os arquivos de entrada.")
+            return 1
+
+        try:
+            hits_base = base_json['result']['hits']['hits']
+        except (KeyError, TypeError):
+            # Sem o esqueleto do primeiro arquivo não há onde encaixar os
+            # hits: aborta pelo caminho de erro em vez de deixar a escrita
+            # estourar um KeyError ao montar o resultado.
+            log.warning(f"Aviso: O arquivo {os.path.basename(file_names[0])} não contém a estrutura esperada 'result.hits.hits'.")
+            log.error("Não foi possível realizar o merge. Verifique os arquivos de entrada.")
+            return 1
+
+        demais = file_names[1:]
+        if demais:
+            # Uma fila limitada por arquivo, consumidas na ordem das páginas:
+            # como os produtores são submetidos na mesma ordem em que o
+            # escritor drena, os anteriores já terminaram quando uma fila é
+            # aguardada e não há como travar o pool.
+            filas = [Queue(maxsize=capacidade) for _ in demais]
+            futuros = [executor.submit(produzir_hits, fp, fila)
+                       for fp, fila in zip(demais, filas)]
+            total = escrever_merge(output_file, base_json,
+                                   itertools.chain(hits_base, drenar_em_ordem(filas)),
+                                   identado=args.pretty, comprimir=comprimir)
+            for futuro in futuros:
+                erro = futuro.result()
+                if erro:
+                    log.warning(erro)
+        else:
+            # Uma página só: o total já é conhecido do parse completo, então a
+            # escrita sai em passada única, sem o spool temporário.
+            total = escrever_merge(output_file, base_json, hits_base,
+                                   identado=args.pretty, comprimir=comprimir,
+                                   total=len(hits_base))
+
+    if total:
+        log.info(f"Merge concluído com sucesso! O resultado foi salvo em '{output_file}'.")
+        return 0
+
+    os.remove(output_file)
+    log.error("Não foi possível realizar o merge. Verifique os arquivos de entrada.")
+    return 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())